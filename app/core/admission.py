@@ -0,0 +1,240 @@
+import asyncio
+import math
+import time
+import anyio
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from fastapi.responses import JSONResponse
+from .config import get_env
+
+# Paths never queued or shed (/live streams stay open and poll upstream on their own)
+EXEMPT_PATHS = ("/health", "/docs", "/redoc", "/openapi.json", "/live")
+
+# name -> (path prefixes, initial limit, max limit, queue size, target latency in seconds)
+# First matching prefix wins; "light" takes everything else.
+ROUTE_CLASSES: List[Tuple[str, Tuple[str, ...], int, int, int, float]] = [
+    # minutes-long full scans: kept apart so they don't drag the heavy class's limit down
+    ("ngrams", ("/totals/search-terms/ngrams",), 1, 2, 4, 300.0),
+    ("heavy", ("/totals/keywords", "/totals/search-terms"), 2, 8, 8, 10.0),
+    ("reports", ("/totals", "/sales", "/campaigns", "/traffic-sources"), 4, 16, 32, 3.0),
+    ("light", ("",), 16, 64, 64, 1.0),
+]
+
+
+class Shed(Exception):
+    pass
+
+
+T = TypeVar("T")
+
+# Seconds spent waiting on Google Ads by the request being handled (None outside admitted requests)
+_upstream_seconds: ContextVar[Optional[List[float]]] = ContextVar("upstream_seconds", default=None)
+
+
+def timed_upstream(stream: Iterable[T]) -> Iterator[T]:
+    """
+    Pass an upstream stream through, adding the time spent waiting on it
+    to the current request's upstream latency.
+    """
+    spent = _upstream_seconds.get()
+    if spent is None:
+        yield from stream
+        return
+    it = iter(stream)
+    while True:
+        start = time.monotonic()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        finally:
+            spent[0] += time.monotonic() - start
+        yield item
+
+
+class RouteClass:
+    """
+    Concurrency limit + bounded FIFO queue for one class of routes.
+    The limit follows the upstream latency of its requests (AIMD): +1 per
+    request whose Google Ads calls took less than the target, x0.9 when the
+    moving average goes above it. Requests served without upstream calls
+    (cache hits) leave the limit alone.
+    """
+
+    def __init__(self, name: str, limit: int, max_limit: int, max_queue: int, target_latency: float, max_wait: float):
+        self.name = name
+        self.limit = float(limit)
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.target_latency = target_latency
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiters: deque = deque()
+        # stats
+        self.admitted = 0
+        self.shed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.latency_ewma: Optional[float] = None
+
+    def _has_slot(self) -> bool:
+        return self.active < max(1, int(self.limit))
+
+    async def acquire(self) -> float:
+        start = time.monotonic()
+        if self._has_slot() and not self.waiters:
+            self.active += 1
+        else:
+            if len(self.waiters) >= self.max_queue:
+                self.shed += 1
+                raise Shed()
+            fut = asyncio.get_running_loop().create_future()
+            self.waiters.append(fut)
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), self.max_wait)
+            except asyncio.TimeoutError:
+                self._drop_waiter(fut)
+                self.shed += 1
+                raise Shed()
+            except asyncio.CancelledError:
+                # client went away; give back a slot we may have been handed
+                self._drop_waiter(fut)
+                raise
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        return waited
+
+    def _drop_waiter(self, fut: asyncio.Future) -> None:
+        if fut.done() and not fut.cancelled():
+            self.release(None)
+        else:
+            fut.cancel()
+            try:
+                self.waiters.remove(fut)
+            except ValueError:
+                pass
+
+    def release(self, latency: Optional[float]) -> None:
+        self.active -= 1
+        if latency is not None:
+            self._adapt(latency)
+        while self.waiters and self._has_slot():
+            fut = self.waiters.popleft()
+            if not fut.done():
+                self.active += 1
+                fut.set_result(None)
+
+    def _adapt(self, latency: float) -> None:
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        if self.latency_ewma > self.target_latency:
+            self.limit = max(1.0, self.limit * 0.9)
+        elif latency <= self.target_latency:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / max(1.0, self.limit))
+
+    def retry_after(self) -> int:
+        per_request = self.latency_ewma or self.target_latency
+        return max(1, math.ceil(per_request * (len(self.waiters) + 1) / max(1, int(self.limit))))
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "limit": int(self.limit),
+            "active": self.active,
+            "queued": len(self.waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "avg_wait_ms": round(self.wait_total / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 1),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "target_latency_ms": round(self.target_latency * 1000, 1),
+        }
+
+
+def _build_classes() -> List[Tuple[Tuple[str, ...], RouteClass]]:
+    max_wait = float(get_env("ADMISSION_MAX_WAIT_SECONDS", required=False, default="30"))
+    out = []
+    for name, prefixes, limit, max_limit, max_queue, target in ROUTE_CLASSES:
+        env = f"ADMISSION_{name.upper()}"
+        limit = int(get_env(f"{env}_LIMIT", required=False, default=str(limit)))
+        max_limit = max(limit, int(get_env(f"{env}_MAX_LIMIT", required=False, default=str(max_limit))))
+        max_queue = int(get_env(f"{env}_QUEUE", required=False, default=str(max_queue)))
+        out.append((prefixes, RouteClass(name, limit, max_limit, max_queue, target, max_wait)))
+    return out
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware: each request waits for a slot of its route class, or
+    gets a fast 503 with Retry-After when that class's queue is full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.classes = _build_classes()
+
+    def classify(self, path: str) -> Optional[RouteClass]:
+        if path.startswith(EXEMPT_PATHS):
+            return None
+        for prefixes, rc in self.classes:
+            if path.startswith(prefixes):
+                return rc
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return {rc.name: rc.stats() for _, rc in self.classes}
+
+    async def __call__(self, scope, receive, send):
+        rc = self.classify(scope["path"]) if scope["type"] == "http" else None
+        if rc is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await rc.acquire()
+        except Shed:
+            response = JSONResponse(
+                status_code=503,
+                content={"status": "error", "details": f"Server busy ({rc.name} requests), retry later"},
+                headers={"Retry-After": str(rc.retry_after())},
+            )
+            await response(scope, receive, send)
+            return
+        # Handler threads get a copy of this context, so they add to the same list
+        spent = [0.0]
+        token = _upstream_seconds.set(spent)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _upstream_seconds.reset(token)
+            rc.release(spent[0] or None)
+
+
+_middleware: Optional[AdmissionMiddleware] = None
+
+
+def admission_middleware(app) -> AdmissionMiddleware:
+    """
+    Factory for app.add_middleware; keeps the instance so /health can report it.
+    """
+    global _middleware
+    _middleware = AdmissionMiddleware(app)
+    return _middleware
+
+
+def size_thread_pool() -> None:
+    """
+    Report handlers are plain `def` and run in the AnyIO thread pool (40
+    threads by default). Make room for every request the classes can admit,
+    so the limits above are what bounds concurrency, not the pool.
+    """
+    if _middleware is None:
+        return
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    admitted = sum(rc.max_limit for _, rc in _middleware.classes)
+    limiter.total_tokens = max(limiter.total_tokens, admitted)
+
+
+def admission_stats() -> Dict[str, Dict[str, object]]:
+    return _middleware.stats() if _middleware is not None else {}
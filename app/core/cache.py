@@ -0,0 +1,153 @@
+import hashlib
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import Iterable, List, Optional
+
+from .config import get_env, resolve_from_root
+
+# Host-wide GAQL result cache shared by all uvicorn workers.
+# SQLite in WAL mode: readers never block on the writer and every write is a
+# single transaction, so a worker sees either the whole entry or nothing.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS gaql_cache (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL
+)
+"""
+_LEN = struct.Struct("<I")
+# GAQL string literals, single or double quoted, with backslash escapes
+_LITERAL = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")""")
+
+
+def cache_key(customer_id: str, query: str) -> str:
+    # Whitespace-insensitive outside string literals, so the same query from
+    # different routes/indents hits; 'a  b' and 'a b' stay different filters
+    parts = _LITERAL.split(query)
+    normalized = "".join(p if i % 2 else " ".join(p.split()) for i, p in enumerate(parts))
+    return hashlib.sha256(f"{customer_id}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def pack_batches(batches: Iterable[bytes]) -> bytes:
+    """
+    Length-prefixed serialized batches, compressed as a single blob.
+    """
+    buf = bytearray()
+    for b in batches:
+        buf += _LEN.pack(len(b))
+        buf += b
+    return zlib.compress(bytes(buf), 1)
+
+
+def unpack_batches(payload: bytes) -> List[bytes]:
+    data = zlib.decompress(payload)
+    out, pos = [], 0
+    while pos < len(data):
+        (n,) = _LEN.unpack_from(data, pos)
+        pos += _LEN.size
+        out.append(data[pos:pos + n])
+        pos += n
+    return out
+
+
+class ResultCache:
+    """
+    TTL + size-bounded store of serialized GAQL stream batches.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[List[bytes]]:
+        """
+        Batches stored under key, if not expired and (with max_age) stored at
+        most max_age seconds ago.
+        """
+        now = time.time()
+        # stored_at = expires_at - ttl, so "age <= max_age" is a bound on expires_at
+        min_expires = now if max_age is None else max(now, now + self.ttl_seconds - max_age)
+        # Plain SELECT: a WAL snapshot read, no lock taken against writers
+        row = self._conn().execute(
+            "SELECT payload FROM gaql_cache WHERE key = ? AND expires_at > ?",
+            (key, min_expires),
+        ).fetchone()
+        if row is None:
+            return None
+        return unpack_batches(row[0])
+
+    def put(self, key: str, batches: Iterable[bytes]) -> None:
+        payload = pack_batches(batches)
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO gaql_cache (key, expires_at, size, payload) VALUES (?, ?, ?, ?)",
+                (key, now + self.ttl_seconds, len(payload), payload),
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM gaql_cache WHERE expires_at <= ?", (now,))
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM gaql_cache").fetchone()
+        if total <= self.max_bytes:
+            return
+        # Drop the entries closest to expiry until we fit again
+        freed = 0
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM gaql_cache ORDER BY expires_at"):
+            victims.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        conn.executemany("DELETE FROM gaql_cache WHERE key = ?", victims)
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM gaql_cache")
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Cache configured from the environment; None when GAQL_CACHE_TTL_SECONDS is 0.
+    """
+    global _cache
+    ttl = float(get_env("GAQL_CACHE_TTL_SECONDS", required=False, default="300"))
+    if ttl <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                path = resolve_from_root(get_env("GAQL_CACHE_PATH", required=False, default=".cache/gaql.sqlite3"))
+                path.parent.mkdir(parents=True, exist_ok=True)
+                max_bytes = int(get_env("GAQL_CACHE_MAX_BYTES", required=False, default=str(256 * 1024 * 1024)))
+                _cache = ResultCache(str(path), ttl, max_bytes)
+    return _cache
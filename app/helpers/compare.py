@@ -0,0 +1,179 @@
+from array import array
+from datetime import date, timedelta
+from operator import sub
+from typing import Dict, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Query
+from google.ads.googleads.client import GoogleAdsClient
+from app.helpers.conversions import run_gaql_stream, pick_values, micros_to_amount, safe_div
+from app.helpers.dimensions import DimensionJoin, get_dimension_index
+from app.helpers.rows import RowSet
+
+COMPARE_MODES = ("previous_period", "previous_year")
+
+# Metrics fetched per day; derived ones (cost, roas) are computed after the split
+_METRICS = ("clicks", "cost_micros", "conversions", "conversions_value")
+_CURRENT, _PREVIOUS = 0, 1
+# Row per keyword/search term per day: aggregated while streamed, too big to buffer for the cache
+_UNCACHED = ("keyword_view", "search_term_view")
+
+
+def _shift_year(d: date) -> date:
+    try:
+        return d.replace(year=d.year - 1)
+    except ValueError:  # Feb 29
+        return d.replace(year=d.year - 1, day=28)
+
+
+def comparison_windows(start_date: str, end_date: str, compare: str) -> Dict[str, Dict[str, str]]:
+    """
+    Current window as given and the previous one it is compared with.
+    - previous_period: same number of days, right before start_date
+    - previous_year: same dates one year earlier
+    """
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError("end_date must not be before start_date")
+    if compare == "previous_period":
+        prev_end = start - timedelta(days=1)
+        prev_start = prev_end - (end - start)
+    elif compare == "previous_year":
+        prev_start, prev_end = _shift_year(start), _shift_year(end)
+    else:
+        raise ValueError(f"compare must be one of {', '.join(COMPARE_MODES)}")
+    return {
+        "current": {"start_date": start.isoformat(), "end_date": end.isoformat()},
+        "previous": {"start_date": prev_start.isoformat(), "end_date": prev_end.isoformat()},
+    }
+
+
+COMPARE_QUERY = Query(
+    None,
+    pattern="^(previous_period|previous_year)$",
+    description="previous_period or previous_year. Requires start_date and end_date; returns current, previous, delta and % change",
+)
+
+
+def windows_or_400(compare: str, start_date: Optional[str], end_date: Optional[str]) -> Dict[str, Dict[str, str]]:
+    """
+    comparison_windows for a route: bad or missing dates become a 400.
+    """
+    if not (start_date and end_date):
+        raise HTTPException(400, detail={"status": "error", "details": "compare requires start_date and end_date"})
+    try:
+        return comparison_windows(start_date, end_date, compare)
+    except ValueError as e:
+        raise HTTPException(400, detail={"status": "error", "details": str(e)})
+
+
+def _pct_change(delta: float, prev: float) -> Optional[float]:
+    return round(delta / prev * 100, 2) if prev else None
+
+
+def _roas(value: float, cost: float) -> Optional[float]:
+    return safe_div(value, cost) if cost > 0 else None
+
+
+def _roas_delta(cur: Optional[float], prev: Optional[float]) -> Optional[float]:
+    return round(cur - prev, 4) if cur is not None and prev is not None else None
+
+
+def _round_sub(a: float, b: float) -> float:
+    return round(a - b, 2)
+
+
+def compare_totals(
+    client: GoogleAdsClient,
+    customer_id: str,
+    resource: str,
+    key_fields: Sequence[Tuple[str, str]],
+    windows: Dict[str, Dict[str, str]],
+    where: Optional[str] = None,
+) -> RowSet:
+    """
+    Fetch both windows in one query segmented by segments.date and split the
+    rows locally into a current and a previous aggregate per key.
+    key_fields: (GAQL field, output key) pairs, e.g. ("campaign.id", "campaign_id").
+    Name fields among the keys are joined from the DimensionIndex, not
+    repeated upstream on every daily row.
+    """
+    cur, prev = windows["current"], windows["previous"]
+    span_start = min(cur["start_date"], prev["start_date"])
+    span_end = max(cur["end_date"], prev["end_date"])
+
+    join = DimensionJoin([f for f, _ in key_fields])
+    key_sel = join.upstream
+    sel = key_sel + ["segments.date"] + [f"metrics.{m}" for m in _METRICS]
+    where_clause = f" WHERE segments.date BETWEEN '{span_start}' AND '{span_end}' "
+    if where:
+        where_clause += " AND " + where
+    query = f"""
+      SELECT {', '.join(sel)}
+      FROM {resource}
+      {where_clause}
+    """
+
+    # One column per (metric, window); a group's slot is its index in every column
+    cols = {(m, w): array("d") for m in _METRICS for w in (_CURRENT, _PREVIOUS)}
+    slots: Dict[tuple, int] = {}
+    groups: List[tuple] = []
+
+    for batch in run_gaql_stream(client, customer_id, query, use_cache=resource not in _UNCACHED):
+        for row in batch.results:
+            d = row.segments.date
+            if cur["start_date"] <= d <= cur["end_date"]:
+                w = _CURRENT
+            elif prev["start_date"] <= d <= prev["end_date"]:
+                w = _PREVIOUS
+            else:  # previous_year spans the gap between both windows
+                continue
+            # pick_values turns enums (e.g. ad_network_type) into their names
+            key = pick_values(row, key_sel)
+            slot = slots.get(key)
+            if slot is None:
+                slot = slots[key] = len(groups)
+                groups.append(key)
+                for col in cols.values():
+                    col.append(0.0)
+            m = row.metrics
+            cols[("clicks", w)][slot] += m.clicks
+            cols[("cost_micros", w)][slot] += m.cost_micros
+            cols[("conversions", w)][slot] += m.conversions
+            cols[("conversions_value", w)][slot] += m.conversions_value
+
+    if join.kinds:
+        index = get_dimension_index(customer_id)
+        index.ensure(client, join.kinds)
+        # ids -> key_fields order with names filled in, rewritten in place
+        groups = join.rows(client, index, groups).rows
+
+    # Column-wise derived metrics, deltas and percent changes
+    out_cols: Dict[str, list] = {}
+    cost = {w: [micros_to_amount(x) for x in cols[("cost_micros", w)]] for w in (_CURRENT, _PREVIOUS)}
+    series = {
+        "clicks": {w: [int(x) for x in cols[("clicks", w)]] for w in (_CURRENT, _PREVIOUS)},
+        "cost": cost,
+        "conversions": {w: [round(x, 2) for x in cols[("conversions", w)]] for w in (_CURRENT, _PREVIOUS)},
+        "conversion_value": {w: [round(x, 2) for x in cols[("conversions_value", w)]] for w in (_CURRENT, _PREVIOUS)},
+    }
+    for name, s in series.items():
+        delta = list(map(sub if name == "clicks" else _round_sub, s[_CURRENT], s[_PREVIOUS]))
+        out_cols[name] = s[_CURRENT]
+        out_cols[f"{name}_prev"] = s[_PREVIOUS]
+        out_cols[f"{name}_delta"] = delta
+        out_cols[f"{name}_pct_change"] = list(map(_pct_change, delta, s[_PREVIOUS]))
+
+    value = series["conversion_value"]
+    roas_cur = list(map(_roas, value[_CURRENT], cost[_CURRENT]))
+    roas_prev = list(map(_roas, value[_PREVIOUS], cost[_PREVIOUS]))
+    roas_delta = list(map(_roas_delta, roas_cur, roas_prev))
+    out_cols["roas"] = roas_cur
+    out_cols["roas_prev"] = roas_prev
+    out_cols["roas_delta"] = roas_delta
+    out_cols["roas_pct_change"] = [
+        _pct_change(d, p) if d is not None else None for d, p in zip(roas_delta, roas_prev)
+    ]
+
+    rows = RowSet([k for _, k in key_fields] + list(out_cols))
+    for key, values in zip(groups, zip(*out_cols.values())):
+        rows.append(key + values)
+    return rows
@@ -1,10 +1,62 @@
+import logging
 from google.ads.googleads.client import GoogleAdsClient
 from typing import Dict, Optional, List, Any
+from app.core.admission import timed_upstream
+from app.core.cache import cache_key, get_result_cache
+
+logger = logging.getLogger(__name__)
 
 # Run a GAQL query and return the results as a stream
-def run_gaql_stream(client: GoogleAdsClient, customer_id: str, query: str):
+# Results are served from the host-wide cache when a worker already fetched them
+# Time spent waiting on the stream feeds the admission limits (app.core.admission)
+def run_gaql_stream(client: GoogleAdsClient, customer_id: str, query: str, use_cache: bool = True, max_age: Optional[float] = None):
+    cache = get_result_cache() if use_cache else None
+    if cache is None:
+        ga = client.get_service("GoogleAdsService")
+        yield from timed_upstream(ga.search_stream(customer_id=customer_id, query=query))
+        return
+
+    key = cache_key(customer_id, query)
+    response_type = type(client.get_type("SearchGoogleAdsStreamResponse"))
+    # The cache is best effort: any failure falls back to upstream / skips storing
+    try:
+        cached = cache.get(key, max_age)
+    except Exception:
+        logger.warning("GAQL cache read failed, querying upstream", exc_info=True)
+        cached = None
+    if cached is not None:
+        for raw in cached:
+            yield _deserialize(response_type, raw)
+        return
+
     ga = client.get_service("GoogleAdsService")
-    return ga.search_stream(customer_id=customer_id, query=query)
+    raws: Optional[List[bytes]] = []
+    size = 0
+    for batch in timed_upstream(ga.search_stream(customer_id=customer_id, query=query)):
+        if raws is not None:
+            raw = _serialize(batch)
+            size += len(raw)
+            raws.append(raw)
+            # Too big to ever be stored: stop holding batches
+            if size > cache.max_bytes:
+                raws = None
+        yield batch
+    # Only a fully consumed stream is stored
+    if raws is not None:
+        try:
+            cache.put(key, raws)
+        except Exception:
+            logger.warning("GAQL cache write failed, result not cached", exc_info=True)
+
+def _serialize(batch: Any) -> bytes:
+    if hasattr(batch, "SerializeToString"):
+        return batch.SerializeToString()
+    return type(batch).serialize(batch)
+
+def _deserialize(response_type: Any, raw: bytes) -> Any:
+    if hasattr(response_type, "FromString"):
+        return response_type.FromString(raw)
+    return response_type.deserialize(raw)
 
 # Convert micros to amount
 def micros_to_amount(micros: int | float) -> float:
@@ -56,6 +108,22 @@ def pick_fields(row: Any, fields: List[str]) -> Dict[str, Any]:
             out[path] = None
     return out
 
+# Pick fields from the row object as a tuple (same order as fields)
+def pick_values(row: Any, fields: List[str]) -> tuple:
+    """
+    Same as pick_fields, without building a dict per row.
+    """
+    out = []
+    for path in fields:
+        cur = row
+        try:
+            for part in path.split("."):
+                cur = getattr(cur, part)
+            out.append(extract_value(cur))
+        except AttributeError:
+            out.append(None)
+    return tuple(out)
+
 # Normalize fields from the user input
 def normalize_fields(user_fields: Optional[str], default_fields: List[str]) -> List[str]:
     if user_fields:
@@ -0,0 +1,240 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from google.ads.googleads.client import GoogleAdsClient
+from app.core.config import get_env
+from app.helpers.conversions import run_gaql_stream, pick_values
+from app.helpers.rows import RowSet
+
+# Queries shared with the routes that list these dimensions, so the index is
+# seeded from the same results instead of an extra upstream call
+CAMPAIGNS_QUERY = """
+    SELECT campaign.id, campaign.name
+    FROM campaign
+    ORDER BY campaign.id
+"""
+CONVERSION_ACTIONS_QUERY = """
+  SELECT
+    conversion_action.id,
+    conversion_action.name,
+    conversion_action.category,
+    conversion_action.status,
+    conversion_action.type,
+    conversion_action.primary_for_goal
+  FROM conversion_action
+  ORDER BY conversion_action.name
+"""
+
+# kind -> (resource, full listing query or None, id fields, name field)
+# Ad groups and keywords have no listing: accounts can hold millions of them,
+# so they are fetched by id the first time a report needs their names.
+_DIMENSIONS: Dict[str, Tuple[str, Optional[str], Tuple[str, ...], str]] = {
+    "campaign": ("campaign", CAMPAIGNS_QUERY, ("campaign.id",), "campaign.name"),
+    "ad_group": ("ad_group", None, ("ad_group.id",), "ad_group.name"),
+    "keyword": (
+        "ad_group_criterion", None,
+        ("ad_group.id", "ad_group_criterion.criterion_id"), "ad_group_criterion.keyword.text",
+    ),
+    "conversion_action": ("conversion_action", CONVERSION_ACTIONS_QUERY, ("conversion_action.id",), "conversion_action.name"),
+}
+
+# Name field -> dimension kind it is joined from
+NAME_FIELDS: Dict[str, str] = {name: kind for kind, (_, _, _, name) in _DIMENSIONS.items()}
+
+# change_status resource types we follow, and how to read ids from their resource names
+_CHANGE_KINDS = {
+    "CAMPAIGN": ("campaign", "change_status.campaign"),
+    "AD_GROUP": ("ad_group", "change_status.ad_group"),
+    "AD_GROUP_CRITERION": ("keyword", "change_status.ad_group_criterion"),
+}
+
+
+def _ids_from_resource_name(resource_name: str) -> Tuple[int, ...]:
+    # customers/1/campaigns/2 -> (2,), customers/1/adGroupCriteria/3~4 -> (3, 4)
+    return tuple(int(p) for p in resource_name.rsplit("/", 1)[-1].split("~"))
+
+
+def _in_clause(field: str, values: Iterable[Any]) -> str:
+    return f"{field} IN ({', '.join(str(int(v)) for v in values)})"
+
+
+class DimensionIndex:
+    """
+    Names of campaigns, ad groups, keywords and conversion actions of one
+    customer, keyed by their ids. Campaigns and conversion actions are
+    listed once, ad groups and keywords are fetched as reports need them;
+    all of them are then kept up to date through change_status.
+    Shared by the request threads: state changes under _lock, upstream
+    calls run outside it.
+    """
+
+    def __init__(self, customer_id: str, poll_seconds: float):
+        self.customer_id = customer_id
+        self.poll_seconds = poll_seconds
+        self.names: Dict[str, Dict[tuple, str]] = {kind: {} for kind in _DIMENSIONS}
+        self.loaded: Set[str] = set()
+        self._last_poll = 0.0
+        # change_status is filtered in account time; start a day back to be safe
+        self._watermark = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+        self._lock = threading.Lock()
+
+    def seed(self, kind: str, items: Iterable[Tuple[tuple, str]]) -> None:
+        """
+        Replace a listed kind with a complete, uncached listing (e.g. what
+        /campaigns just fetched).
+        """
+        items = dict(items)
+        with self._lock:
+            names = self.names[kind]
+            names.clear()
+            names.update(items)
+            self.loaded.add(kind)
+
+    def _fetch(self, client: GoogleAdsClient, kind: str, where: Optional[str] = None) -> List[Tuple[tuple, str]]:
+        resource, query, id_fields, name_field = _DIMENSIONS[kind]
+        if where:
+            # targeted lookups: ids and name only
+            query = f"SELECT {', '.join(id_fields + (name_field,))} FROM {resource} WHERE {where}"
+        fields = list(id_fields) + [name_field]
+        out = []
+        # Never from the result cache: a stale listing would undo renames already polled
+        for batch in run_gaql_stream(client, self.customer_id, query, use_cache=False):
+            for row in batch.results:
+                values = pick_values(row, fields)
+                out.append((values[:-1], values[-1]))
+        return out
+
+    def ensure(self, client: GoogleAdsClient, kinds: Iterable[str]) -> None:
+        with self._lock:
+            listing = [k for k in kinds if _DIMENSIONS[k][1] is not None and k not in self.loaded]
+            # Nothing cached means nothing to keep fresh
+            poll = any(self.names.values()) and time.monotonic() - self._last_poll >= self.poll_seconds
+            if poll:
+                # claimed here so concurrent requests don't poll the same window
+                self._last_poll = time.monotonic()
+        for kind in listing:
+            self.seed(kind, self._fetch(client, kind))
+        if poll:
+            self._poll_changes(client)
+
+    def _poll_changes(self, client: GoogleAdsClient) -> None:
+        with self._lock:
+            watermark = self._watermark
+        until = (datetime.utcnow() + timedelta(days=1)).strftime("%Y-%m-%d")
+        query = f"""
+          SELECT
+            change_status.resource_type,
+            change_status.last_change_date_time,
+            change_status.campaign,
+            change_status.ad_group,
+            change_status.ad_group_criterion
+          FROM change_status
+          WHERE change_status.last_change_date_time > '{watermark}'
+            AND change_status.last_change_date_time <= '{until}'
+          ORDER BY change_status.last_change_date_time
+          LIMIT 10000
+        """
+        changed: Dict[str, Set[tuple]] = {kind: set() for kind, _ in _CHANGE_KINDS.values()}
+        for batch in run_gaql_stream(client, self.customer_id, query, use_cache=False):
+            for row in batch.results:
+                cs = row.change_status
+                watermark = max(watermark, cs.last_change_date_time)
+                follow = _CHANGE_KINDS.get(cs.resource_type.name)
+                if follow is not None:
+                    kind, field = follow
+                    changed[kind].add(_ids_from_resource_name(pick_values(row, [field])[0]))
+        for kind, ids in changed.items():
+            with self._lock:
+                # Listed kinds take new entities too; fetched-by-id kinds only what is cached
+                if kind not in self.loaded:
+                    ids = {k for k in ids if k in self.names[kind]}
+            # Removed entities are refreshed too: they keep a name for their old metrics
+            if ids:
+                self._refresh(client, kind, ids)
+        with self._lock:
+            self._watermark = max(self._watermark, watermark)
+
+    def _refresh(self, client: GoogleAdsClient, kind: str, keys: Iterable[tuple]) -> None:
+        id_fields = _DIMENSIONS[kind][2]
+        keys = list(keys)
+        wanted = set(keys)
+        for i in range(0, len(keys), 1000):
+            chunk = keys[i:i + 1000]
+            where = " AND ".join(_in_clause(f, {k[p] for k in chunk}) for p, f in enumerate(id_fields))
+            # IN per id field can match more pairs than asked; keep only the wanted keys
+            found = [(key, name) for key, name in self._fetch(client, kind, where) if key in wanted]
+            with self._lock:
+                self.names[kind].update(found)
+
+    def lookup(self, client: GoogleAdsClient, kind: str, keys: Iterable[tuple]) -> Dict[tuple, str]:
+        """
+        Names for keys, fetching the ones not known yet. Returns a snapshot
+        of just those keys, safe to read while other threads update the index.
+        """
+        keys = set(keys)
+        names = self.names[kind]
+        with self._lock:
+            missing = [k for k in keys if k not in names]
+        if missing:
+            self._refresh(client, kind, missing)
+        with self._lock:
+            return {k: names[k] for k in keys if k in names}
+
+
+class DimensionJoin:
+    """
+    Rewrites a field selection so upstream only returns ids and metrics,
+    then puts the name fields back from the DimensionIndex.
+    """
+
+    def __init__(self, sel: Sequence[str], keep: Optional[str] = None):
+        self.sel = list(sel)
+        # Name fields used in ORDER BY stay upstream, GAQL has to see them
+        joined = [f for f in sel if f in NAME_FIELDS and f not in (keep or "")]
+        self.upstream = [f for f in sel if f not in joined]
+        self.kinds = [NAME_FIELDS[f] for f in joined]
+        for kind in self.kinds:
+            for f in _DIMENSIONS[kind][2]:
+                if f not in self.upstream:
+                    self.upstream.append(f)
+        pos = {f: i for i, f in enumerate(self.upstream)}
+        # per output field: index in upstream values, or (kind, id positions)
+        self._plan = [
+            (NAME_FIELDS[f], tuple(pos[i] for i in _DIMENSIONS[NAME_FIELDS[f]][2])) if f in joined else pos[f]
+            for f in sel
+        ]
+
+    def rows(self, client: GoogleAdsClient, index: DimensionIndex, raw: List[tuple]) -> RowSet:
+        """
+        Joined rows built in place: raw becomes the RowSet's row list, so
+        the rows are never held twice.
+        """
+        names: Dict[str, Dict[tuple, str]] = {}
+        for step in self._plan:
+            if isinstance(step, tuple):
+                kind, id_pos = step
+                names[kind] = index.lookup(client, kind, (tuple(r[p] for p in id_pos) for r in raw))
+        for i, r in enumerate(raw):
+            raw[i] = tuple(
+                names[step[0]].get(tuple(r[p] for p in step[1])) if isinstance(step, tuple) else r[step]
+                for step in self._plan
+            )
+        out = RowSet(self.sel)
+        out.rows = raw
+        return out
+
+
+_indexes: Dict[str, DimensionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_dimension_index(customer_id: str) -> DimensionIndex:
+    index = _indexes.get(customer_id)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(customer_id)
+            if index is None:
+                poll = float(get_env("DIMENSION_POLL_SECONDS", required=False, default="60"))
+                index = _indexes[customer_id] = DimensionIndex(customer_id, poll)
+    return index
@@ -0,0 +1,271 @@
+import csv
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from app.core.ads_client import get_google_ads_client
+from app.core.config import get_env, resolve_from_root
+from app.helpers.conversions import run_gaql_stream, pick_values
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # in requirements.txt; a slim install still exports CSV
+    pa = pq = None
+
+EXPORT_SCOPES = {
+    "customer": ["metrics.clicks", "metrics.impressions", "metrics.conversions", "metrics.conversions_value", "metrics.cost_micros"],
+    "campaign": ["campaign.id", "campaign.name", "metrics.clicks", "metrics.impressions", "metrics.conversions", "metrics.conversions_value", "metrics.cost_micros"],
+    "ad_group": ["campaign.id", "ad_group.id", "ad_group.name", "metrics.clicks", "metrics.impressions", "metrics.conversions", "metrics.conversions_value", "metrics.cost_micros"],
+    "keyword_view": ["ad_group.id", "ad_group_criterion.criterion_id", "ad_group_criterion.keyword.text", "metrics.clicks", "metrics.impressions", "metrics.conversions", "metrics.conversions_value", "metrics.cost_micros"],
+    "search_term_view": ["campaign.id", "ad_group.id", "search_term_view.search_term", "metrics.clicks", "metrics.impressions", "metrics.conversions", "metrics.conversions_value", "metrics.cost_micros"],
+}
+EXPORT_FORMATS = ("csv", "parquet")
+
+logger = logging.getLogger(__name__)
+
+# queued -> running -> done | failed
+_ACTIVE = ("queued", "running")
+# Seconds between job.json updates while a chunk is being written
+_PROGRESS_SECONDS = 2.0
+
+
+def exports_dir() -> Path:
+    path = resolve_from_root(get_env("EXPORTS_DIR", required=False, default=".exports"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _chunk_days() -> int:
+    return int(get_env("EXPORT_CHUNK_DAYS", required=False, default="7"))
+
+
+def date_chunks(start_date: str, end_date: str, days: int) -> List[List[str]]:
+    if days < 1:
+        raise ValueError("chunk days must be at least 1 (EXPORT_CHUNK_DAYS)")
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError("end_date must not be before start_date")
+    out = []
+    while start <= end:
+        stop = min(start + timedelta(days=days - 1), end)
+        out.append([start.isoformat(), stop.isoformat()])
+        start = stop + timedelta(days=1)
+    return out
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    # write + rename: readers in other workers never see a half-written file
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_job(job_id: str) -> Optional[Dict[str, Any]]:
+    if not job_id.isalnum():
+        return None
+    path = exports_dir() / job_id / "job.json"
+    if not path.is_file():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def create_job(scope: str, fields: List[str], customer_ids: List[str], start_date: str, end_date: str, fmt: str) -> Dict[str, Any]:
+    """
+    Persist a new job and queue it; the export itself runs in the background.
+    """
+    if fmt == "parquet" and pq is None:
+        raise ValueError("parquet export needs pyarrow installed")
+    customer_ids = [cid.replace("-", "") for cid in customer_ids]
+    if not all(cid.isdigit() for cid in customer_ids):
+        raise ValueError("customer_ids must be numeric")
+    if "segments.date" not in fields:
+        fields = ["segments.date"] + fields
+    chunks = [
+        {"customer_id": cid, "start_date": a, "end_date": b, "file": f"{cid}_{a}_{b}.{fmt}"}
+        for cid in customer_ids
+        for a, b in date_chunks(start_date, end_date, _chunk_days())
+    ]
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "queued",
+        "scope": scope,
+        "fields": fields,
+        "customer_ids": customer_ids,
+        "start_date": start_date,
+        "end_date": end_date,
+        "format": fmt,
+        "chunks": chunks,
+        "chunks_done": 0,
+        "rows": 0,
+        "bytes": 0,
+        # progress of the chunk being written, not counted in rows/bytes yet
+        "chunk_rows": 0,
+        "chunk_bytes": 0,
+        "error": None,
+        "created_at": time.time(),
+        "updated_at": time.time(),
+    }
+    job_dir = exports_dir() / job["job_id"]
+    job_dir.mkdir()
+    _write_json(job_dir / "job.json", job)
+    _queue.put(job["job_id"])
+    _ensure_worker()
+    return job
+
+
+def _write_chunk(client, job: Dict[str, Any], chunk: Dict[str, Any], path: Path, progress: Callable[[int, int], None]) -> int:
+    """
+    Write one chunk file; progress(rows, bytes) is called after every batch.
+    """
+    fields = job["fields"]
+    query = f"""
+      SELECT {', '.join(fields)}
+      FROM {job['scope']}
+      WHERE segments.date BETWEEN '{chunk['start_date']}' AND '{chunk['end_date']}'
+    """
+    rows = 0
+    # Export batches are not worth keeping in the shared result cache
+    stream = run_gaql_stream(client, chunk["customer_id"], query, use_cache=False)
+    if job["format"] == "csv":
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(fields)
+            for batch in stream:
+                for row in batch.results:
+                    w.writerow(pick_values(row, fields))
+                    rows += 1
+                progress(rows, f.tell())
+        return rows
+
+    writer = None
+    try:
+        for batch in stream:
+            values = [pick_values(row, fields) for row in batch.results]
+            if not values:
+                continue
+            # Column-wise: one array per field instead of a dict per row
+            table = pa.Table.from_arrays([pa.array(col) for col in zip(*values)], names=fields)
+            if writer is None:
+                writer = pq.ParquetWriter(str(path), table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(values)
+            progress(rows, path.stat().st_size)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({f: pa.array([], pa.null()) for f in fields}), str(path))
+    return rows
+
+
+def run_job(job_id: str) -> None:
+    """
+    Export every chunk not done yet. Each chunk file is written under a temp
+    name and renamed when complete, so a restart resumes from the next chunk.
+    """
+    job_dir = exports_dir() / job_id
+    lock = open(job_dir / "lock", "w")
+    try:
+        try:
+            # One worker process per job; the lock dies with its process
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        job = read_job(job_id)
+        if job is None or job["status"] not in _ACTIVE:
+            return
+        job["status"] = "running"
+        _write_json(job_dir / "job.json", job)
+
+        last_write = time.monotonic()
+
+        def progress(rows: int, size: int) -> None:
+            nonlocal last_write
+            job["chunk_rows"], job["chunk_bytes"] = rows, size
+            if time.monotonic() - last_write >= _PROGRESS_SECONDS:
+                last_write = time.monotonic()
+                job["updated_at"] = time.time()
+                _write_json(job_dir / "job.json", job)
+
+        try:
+            client = get_google_ads_client()
+            for chunk in job["chunks"][job["chunks_done"]:]:
+                final = job_dir / chunk["file"]
+                tmp = job_dir / (chunk["file"] + ".part")
+                job["chunk_rows"] = job["chunk_bytes"] = 0
+                rows = _write_chunk(client, job, chunk, tmp, progress)
+                os.replace(tmp, final)
+                job["chunks_done"] += 1
+                job["rows"] += rows
+                job["bytes"] += final.stat().st_size
+                job["chunk_rows"] = job["chunk_bytes"] = 0
+                job["updated_at"] = time.time()
+                _write_json(job_dir / "job.json", job)
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            # the partial chunk is written again on retry
+            job["chunk_rows"] = job["chunk_bytes"] = 0
+        job["updated_at"] = time.time()
+        _write_json(job_dir / "job.json", job)
+    finally:
+        lock.close()
+
+
+def retry_job(job_id: str) -> Optional[Dict[str, Any]]:
+    job = read_job(job_id)
+    if job is None:
+        return None
+    if job["status"] == "failed":
+        job["status"] = "queued"
+        job["error"] = None
+        _write_json(exports_dir() / job_id / "job.json", job)
+    if job["status"] in _ACTIVE:
+        _queue.put(job_id)
+        _ensure_worker()
+    return job
+
+
+def resume_jobs() -> None:
+    """
+    Re-queue jobs left queued/running by a previous process (app startup).
+    """
+    for job_file in sorted(exports_dir().glob("*/job.json")):
+        job = read_job(job_file.parent.name)
+        if job and job["status"] in _ACTIVE:
+            _queue.put(job["job_id"])
+            _ensure_worker()
+
+
+_queue: "queue.Queue[str]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def _work() -> None:
+    while True:
+        job_id = _queue.get()
+        try:
+            run_job(job_id)
+        except Exception:
+            # e.g. the job dir is gone; keep serving the jobs queued behind it
+            logger.exception("Export job %s crashed", job_id)
+
+
+def _ensure_worker() -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name="export-worker", daemon=True)
+            _worker.start()
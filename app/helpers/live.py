@@ -0,0 +1,116 @@
+import asyncio
+import json
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from app.core.config import get_env
+from app.helpers.rows import RowSet
+
+# Events kept per subscriber before it is considered too slow and resynced
+_SUBSCRIBER_BUFFER = 32
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def diff_rows(old: Dict[Any, Dict[str, Any]], new: Dict[Any, Dict[str, Any]], key_field: str) -> Optional[Dict[str, list]]:
+    """
+    Rows (key + changed fields only) that changed between two snapshots,
+    plus the keys that disappeared. None when nothing changed.
+    """
+    changed = []
+    for k, row in new.items():
+        prev = old.get(k)
+        if prev is None:
+            changed.append(row)
+            continue
+        fields = {f: v for f, v in row.items() if prev.get(f) != v}
+        if fields:
+            changed.append({key_field: k, **fields})
+    removed = [k for k in old if k not in new]
+    if not changed and not removed:
+        return None
+    return {"changed": changed, "removed": removed}
+
+
+class LiveFeed:
+    """
+    One poller shared by every subscriber of a (customer, scope): the
+    upstream query runs once per interval however many screens watch.
+    Feeds live in one app process; fetch(max_age) gets the interval so
+    pollers of other workers can share one result through the GAQL cache.
+    """
+
+    def __init__(self, key: Tuple[str, str], fetch: Callable[[float], RowSet], key_field: str, interval: float):
+        self.key = key
+        self.fetch = fetch
+        self.key_field = key_field
+        self.interval = interval
+        self.snapshot: Optional[Dict[Any, Dict[str, Any]]] = None
+        self.subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _snapshot_event(self) -> str:
+        return sse_event("snapshot", {"rows": list(self.snapshot.values())})
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=_SUBSCRIBER_BUFFER)
+        if self.snapshot is not None:
+            q.put_nowait(self._snapshot_event())
+        self.subscribers.add(q)
+        # A feed dropped by its last unsubscribe becomes the registered one again
+        _feeds.setdefault(self.key, self)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self.subscribers.discard(q)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            if _feeds.get(self.key) is self:
+                del _feeds[self.key]
+
+    def _broadcast(self, message: str) -> None:
+        for q in list(self.subscribers):
+            try:
+                q.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind for deltas to make sense: start it over from a snapshot
+                while not q.empty():
+                    q.get_nowait()
+                if self.snapshot is not None:
+                    q.put_nowait(self._snapshot_event())
+
+    async def _run(self) -> None:
+        while self.subscribers:
+            try:
+                # Blocking gRPC stream: keep it off the event loop
+                rows = await asyncio.to_thread(self.fetch, self.interval)
+                new = {r[self.key_field]: r for r in rows.dicts()}
+                if self.snapshot is None:
+                    self.snapshot = new
+                    self._broadcast(self._snapshot_event())
+                else:
+                    delta = diff_rows(self.snapshot, new, self.key_field)
+                    self.snapshot = new
+                    # comment line keeps proxies from closing an idle stream
+                    self._broadcast(sse_event("delta", delta) if delta else ": no changes\n\n")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._broadcast(sse_event("error", {"status": "error", "details": str(e)}))
+            await asyncio.sleep(self.interval)
+
+
+_feeds: Dict[Tuple[str, str], LiveFeed] = {}
+
+
+def get_feed(customer_id: str, scope: str, fetch: Callable[[float], RowSet], key_field: str) -> LiveFeed:
+    key = (customer_id, scope)
+    feed = _feeds.get(key)
+    if feed is None:
+        interval = float(get_env("LIVE_POLL_SECONDS", required=False, default="10"))
+        feed = _feeds[key] = LiveFeed(key, fetch, key_field, interval)
+    return feed
+
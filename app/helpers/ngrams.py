@@ -0,0 +1,277 @@
+import multiprocessing
+import re
+import threading
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from google.ads.googleads.client import GoogleAdsClient
+from app.core.config import get_env
+from app.helpers.conversions import run_gaql_stream, micros_to_amount
+from app.helpers.rows import RowSet
+from app.helpers.topk import RANK_METRICS, GroupedTopK
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# Token ids are packed into one int per n-gram, 21 bits each (2M distinct tokens)
+_BITS = 21
+_MASK = (1 << _BITS) - 1
+
+NGRAM_FIELDS = [
+    "search_term_view.search_term",
+    "metrics.clicks",
+    "metrics.impressions",
+    "metrics.cost_micros",
+    "metrics.conversions",
+    "metrics.conversions_value",
+]
+# Rows shipped to worker processes: (term, clicks, impressions, cost_micros, conversions, conversions_value)
+TermRow = Tuple[str, int, int, int, float, float]
+
+
+def tokenize(term: str) -> List[str]:
+    return _TOKEN.findall(term.lower())
+
+
+class NgramTable:
+    """
+    Metrics per 1..3-gram. Tokens are interned to integer ids, an n-gram is
+    its ids packed into one int, and each n-gram owns a slot in flat arrays.
+    """
+
+    def __init__(self, sizes: Sequence[int] = (1, 2, 3)):
+        self.sizes = tuple(sizes)
+        self.tokens: List[str] = []
+        self.token_ids: Dict[str, int] = {}
+        self.slots: Dict[int, int] = {}
+        self.keys = array("q")
+        self.terms = array("q")
+        self.clicks = array("q")
+        self.impressions = array("q")
+        self.cost_micros = array("q")
+        self.conversions = array("d")
+        self.conversions_value = array("d")
+
+    def _intern(self, token: str) -> int:
+        tid = self.token_ids.get(token)
+        if tid is None:
+            if len(self.tokens) >= _MASK:
+                raise ValueError("Too many distinct tokens for n-gram packing")
+            # ids start at 1 so (a) and (0, a) never pack to the same key
+            tid = self.token_ids[token] = len(self.tokens) + 1
+            self.tokens.append(token)
+        return tid
+
+    def _slot(self, key: int) -> int:
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self.slots[key] = len(self.keys)
+            self.keys.append(key)
+            for col in (self.terms, self.clicks, self.impressions, self.cost_micros):
+                col.append(0)
+            self.conversions.append(0.0)
+            self.conversions_value.append(0.0)
+        return slot
+
+    def add(self, term: str, clicks: int, impressions: int, cost_micros: int, conversions: float, value: float) -> None:
+        ids = [self._intern(t) for t in tokenize(term)]
+        # An n-gram repeated inside one term is counted once for that term
+        keys = set()
+        for n in self.sizes:
+            for i in range(len(ids) - n + 1):
+                key = 0
+                for tid in ids[i:i + n]:
+                    key = (key << _BITS) | tid
+                keys.add(key)
+        for key in keys:
+            s = self._slot(key)
+            self.terms[s] += 1
+            self.clicks[s] += clicks
+            self.impressions[s] += impressions
+            self.cost_micros[s] += cost_micros
+            self.conversions[s] += conversions
+            self.conversions_value[s] += value
+
+    def add_rows(self, rows: Iterable[TermRow]) -> "NgramTable":
+        for r in rows:
+            self.add(*r)
+        return self
+
+    def text(self, key: int) -> Tuple[str, int]:
+        """
+        (n-gram text, n) for a packed key.
+        """
+        parts = []
+        while key:
+            parts.append(self.tokens[(key & _MASK) - 1])
+            key >>= _BITS
+        return " ".join(reversed(parts)), len(parts)
+
+    def merge(self, other: "NgramTable") -> None:
+        # Token ids differ between tables: re-intern through the text
+        remap = [0] + [self._intern(t) for t in other.tokens]
+        for j, key in enumerate(other.keys):
+            new_key, shift = 0, 0
+            while key:
+                new_key |= remap[key & _MASK] << shift
+                key >>= _BITS
+                shift += _BITS
+            s = self._slot(new_key)
+            self.terms[s] += other.terms[j]
+            self.clicks[s] += other.clicks[j]
+            self.impressions[s] += other.impressions[j]
+            self.cost_micros[s] += other.cost_micros[j]
+            self.conversions[s] += other.conversions[j]
+            self.conversions_value[s] += other.conversions_value[j]
+
+
+def ngram_size(key: int) -> int:
+    return (key.bit_length() + _BITS - 1) // _BITS
+
+
+def _aggregate_chunk(rows: List[TermRow], sizes: Tuple[int, ...]) -> NgramTable:
+    return NgramTable(sizes).add_rows(rows)
+
+
+def _term_rows(client: GoogleAdsClient, customer_id: str, where_clause: str) -> Iterator[TermRow]:
+    query = f"""
+      SELECT {', '.join(NGRAM_FIELDS)}
+      FROM search_term_view
+      {where_clause}
+    """
+    # Not cached: the cache would buffer the whole stream the table is built from
+    for batch in run_gaql_stream(client, customer_id, query, use_cache=False):
+        for row in batch.results:
+            m = row.metrics
+            yield (row.search_term_view.search_term, m.clicks, m.impressions, m.cost_micros, m.conversions, m.conversions_value)
+
+
+def _chunks(rows: Iterator[TermRow], size: int) -> Iterator[List[TermRow]]:
+    chunk: List[TermRow] = []
+    for r in rows:
+        chunk.append(r)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Tuple[ProcessPoolExecutor, int]:
+    """
+    Process pool shared by all requests of this app process, created on first use.
+    Workers are started by forkserver (spawn where unavailable): forking the
+    threaded server would copy its locks and gRPC channels into the children.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = max(1, int(get_env("NGRAM_POOL_WORKERS", required=False, default="4")))
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context(method))
+        return _pool, _pool_workers
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Drop a broken pool (e.g. a worker was OOM-killed); the next request starts a new one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def aggregate_ngrams(
+    client: GoogleAdsClient,
+    customer_id: str,
+    where_clause: str,
+    sizes: Sequence[int] = (1, 2, 3),
+    workers: int = 0,
+    chunk_size: int = 50_000,
+) -> NgramTable:
+    """
+    Aggregate the search_term_view stream into an NgramTable while it is read.
+    With workers > 0, chunks are tokenized in the shared process pool and
+    merged here; at most 2 * workers chunks (capped by the pool size) are in
+    flight for this request. If the pool breaks, the chunks not merged yet
+    and the rest of the stream are aggregated in this process.
+    """
+    sizes = tuple(sizes)
+    rows = _term_rows(client, customer_id, where_clause)
+    if workers <= 0:
+        return NgramTable(sizes).add_rows(rows)
+
+    pool, pool_workers = _get_pool()
+    in_flight = 2 * min(workers, pool_workers)
+    table = NgramTable(sizes)
+    pending: List[Tuple[List[TermRow], Future]] = []
+    chunk: Optional[List[TermRow]] = None
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            pending.append((chunk, pool.submit(_aggregate_chunk, chunk, sizes)))
+            chunk = None
+            if len(pending) >= in_flight:
+                table.merge(pending[0][1].result())
+                pending.pop(0)
+        while pending:
+            table.merge(pending[0][1].result())
+            pending.pop(0)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        for c, _ in pending:
+            table.add_rows(c)
+        pending = []
+        if chunk is not None:  # submit itself failed
+            table.add_rows(chunk)
+        table.add_rows(rows)
+    finally:
+        # Upstream error: don't leave queued chunks of this request in the shared pool
+        for _, f in pending:
+            f.cancel()
+    return table
+
+
+def rank_ngrams(table: NgramTable, rank_by: str, limit: int, ascending: bool = False, min_clicks: int = 0) -> RowSet:
+    """
+    Top `limit` n-grams per n by rank_by, with derived metrics.
+    """
+    metric_fields, score_fn = RANK_METRICS[rank_by]
+    columns = {
+        "metrics.clicks": table.clicks,
+        "metrics.impressions": table.impressions,
+        "metrics.cost_micros": table.cost_micros,
+        "metrics.conversions": table.conversions,
+        "metrics.conversions_value": table.conversions_value,
+    }
+    score_cols = [columns[f] for f in metric_fields]
+
+    top = GroupedTopK(limit, ascending=ascending)
+    for s, key in enumerate(table.keys):
+        if table.clicks[s] < min_clicks:
+            continue
+        score = score_fn(*(col[s] for col in score_cols))
+        if score is None:
+            continue
+        top.push(ngram_size(key), score, s)
+
+    rows = RowSet(["ngram", "n", "rank", "terms", "clicks", "impressions", "cost", "conversions", "conversions_value",
+                   "ctr", "cpc", "conv_rate", "cac", "roas"])
+    derived = ("ctr", "cpc", "conv_rate", "cac", "roas")
+    for n, rank, _, s in sorted(top.result(), key=lambda r: (r[0], r[1])):
+        text, _ = table.text(table.keys[s])
+        raw = {f: col[s] for f, col in columns.items()}
+        extra = tuple(
+            RANK_METRICS[d][1](*(raw[f] for f in RANK_METRICS[d][0])) for d in derived
+        )
+        rows.append((
+            text, n, rank, table.terms[s], table.clicks[s], table.impressions[s],
+            micros_to_amount(table.cost_micros[s]), round(table.conversions[s], 2),
+            round(table.conversions_value[s], 2),
+        ) + extra)
+    return rows
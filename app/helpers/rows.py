@@ -0,0 +1,96 @@
+import json
+from collections import namedtuple
+from typing import Any, Dict, Iterator, List, Sequence
+from fastapi.responses import JSONResponse
+
+# Same settings Starlette's JSONResponse uses, so the output is byte-identical
+_encode = json.JSONEncoder(
+    ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+).encode
+
+# Row types for the fixed-shape scopes (tuples: no per-row dict, no repeated keys)
+CampaignRow = namedtuple("CampaignRow", ["id", "name"])
+SalesCampaignRow = namedtuple(
+    "SalesCampaignRow",
+    ["campaign_id", "campaign_name", "conversions", "conversion_value", "cost_micros", "cost", "roas"],
+)
+ConversionActionRow = namedtuple(
+    "ConversionActionRow",
+    ["id", "name", "category", "status", "type", "primary_for_goal"],
+)
+TrafficSourceRow = namedtuple(
+    "TrafficSourceRow",
+    ["source", "clicks", "leads", "sales", "conv_rate_pct", "cac", "spend", "revenue", "roas"],
+)
+
+
+class RowSet:
+    """
+    Rows of one scope kept as plain tuples.
+    The keys are stored once per set instead of once per row; each row is
+    expanded into a JSON object only while the response is being written.
+    """
+    __slots__ = ("keys", "rows")
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = tuple(keys)
+        self.rows: List[tuple] = []
+
+    @classmethod
+    def of(cls, row_type) -> "RowSet":
+        return cls(row_type._fields)
+
+    def append(self, values: tuple) -> None:
+        # Stored as given (row namedtuples are tuples already): no second copy per row
+        self.rows.append(values)
+
+    def sort(self, key: str, reverse: bool = False) -> None:
+        i = self.keys.index(key)
+        self.rows.sort(key=lambda r: r[i], reverse=reverse)
+
+    def truncate(self, n: int) -> None:
+        del self.rows[max(0, int(n)):]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[tuple]:
+        return iter(self.rows)
+
+    def dicts(self) -> Iterator[Dict[str, Any]]:
+        keys = self.keys
+        for r in self.rows:
+            yield dict(zip(keys, r))
+
+    def encode(self) -> str:
+        """
+        JSON array of objects, same shape as a list of dicts.
+        """
+        if not self.keys:
+            return "[" + ",".join("{}" for _ in self.rows) + "]"
+        # '{"key":' / ',"key":' are encoded once and reused for every row
+        prefixes = [("{" if i == 0 else ",") + _encode(k) + ":" for i, k in enumerate(self.keys)]
+        out = []
+        for r in self.rows:
+            out.append("".join([p + _encode(v) for p, v in zip(prefixes, r)]) + "}")
+        return "[" + ",".join(out) + "]"
+
+
+def encode_payload(content: Any) -> str:
+    """
+    Encode a response envelope whose top-level values may be RowSets.
+    """
+    if not isinstance(content, dict):
+        return _encode(content)
+    parts = []
+    for k, v in content.items():
+        parts.append(_encode(k) + ":" + (v.encode() if isinstance(v, RowSet) else _encode(v)))
+    return "{" + ",".join(parts) + "}"
+
+
+class RowsJSONResponse(JSONResponse):
+    """
+    JSONResponse that understands RowSet values in the envelope.
+    """
+    def render(self, content: Any) -> bytes:
+        return encode_payload(content).encode("utf-8")
@@ -0,0 +1,107 @@
+import heapq
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from google.ads.googleads.client import GoogleAdsClient
+from app.helpers.conversions import run_gaql_stream, pick_values, micros_to_amount, safe_div
+from app.helpers.dimensions import DimensionJoin, get_dimension_index
+from app.helpers.rows import RowSet
+
+# rank_by -> (metric fields it needs, score from their values); None = not rankable
+RANK_METRICS: Dict[str, Tuple[Tuple[str, ...], Callable[..., Optional[float]]]] = {
+    "clicks": (("metrics.clicks",), lambda c: c),
+    "impressions": (("metrics.impressions",), lambda i: i),
+    "conversions": (("metrics.conversions",), lambda c: c),
+    "conversions_value": (("metrics.conversions_value",), lambda v: v),
+    "cost": (("metrics.cost_micros",), lambda m: micros_to_amount(m)),
+    "ctr": (("metrics.clicks", "metrics.impressions"), lambda c, i: safe_div(c, i) if i else None),
+    "cpc": (("metrics.cost_micros", "metrics.clicks"), lambda m, c: safe_div(micros_to_amount(m), c) if c else None),
+    "conv_rate": (("metrics.conversions", "metrics.clicks"), lambda v, c: safe_div(v, c) if c else None),
+    "cac": (("metrics.cost_micros", "metrics.conversions"), lambda m, v: safe_div(micros_to_amount(m), v) if v else None),
+    "roas": (("metrics.conversions_value", "metrics.cost_micros"), lambda v, m: safe_div(v, micros_to_amount(m)) if m else None),
+}
+GROUP_FIELDS = {"campaign": "campaign.id", "ad_group": "ad_group.id"}
+
+
+class GroupedTopK:
+    """
+    K best items per group from a stream, one bounded min-heap per group:
+    memory is O(K * groups) whatever the stream length.
+    """
+
+    def __init__(self, k: int, ascending: bool = False):
+        self.k = k
+        self.sign = -1 if ascending else 1
+        self.heaps: Dict[Any, List[tuple]] = {}
+        self._seq = count()
+
+    def push(self, group: Any, score: float, item: Any) -> None:
+        heap = self.heaps.setdefault(group, [])
+        # seq keeps ties stable (first seen wins) and items never get compared
+        entry = (self.sign * score, -next(self._seq), item)
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    def result(self) -> List[Tuple[Any, int, float, Any]]:
+        """
+        (group, rank, score, item), groups in first-seen order, best first.
+        """
+        out = []
+        for group, heap in self.heaps.items():
+            for rank, (s, _, item) in enumerate(sorted(heap, reverse=True), start=1):
+                out.append((group, rank, self.sign * s, item))
+        return out
+
+
+def top_k_search_terms(
+    client: GoogleAdsClient,
+    customer_id: str,
+    sel: Sequence[str],
+    where_clause: str,
+    k: int,
+    rank_by: str,
+    group_by: Optional[str] = None,
+    ascending: bool = False,
+) -> RowSet:
+    """
+    Stream the whole search_term_view and keep the top K rows per group by
+    rank_by (a metric or a derived metric such as roas or cac).
+    Each row is a search term within its ad group, as in /totals/search-terms.
+    """
+    metric_fields, score_fn = RANK_METRICS[rank_by]
+    group_field = GROUP_FIELDS.get(group_by) if group_by else None
+
+    out_sel = list(sel) + ([group_field] if group_field and group_field not in sel else [])
+    join = DimensionJoin(out_sel)
+    fetch = join.upstream + [f for f in metric_fields if f not in join.upstream]
+    n = len(join.upstream)
+    metric_pos = [fetch.index(f) for f in metric_fields]
+    group_pos = fetch.index(group_field) if group_field else None
+
+    query = f"""
+      SELECT {', '.join(fetch)}
+      FROM search_term_view
+      {where_clause}
+    """
+
+    top = GroupedTopK(k, ascending=ascending)
+    # Not cached: the cache would buffer every batch and undo the O(K x groups) bound
+    for batch in run_gaql_stream(client, customer_id, query, use_cache=False):
+        for row in batch.results:
+            values = pick_values(row, fetch)
+            score = score_fn(*(values[p] or 0 for p in metric_pos))
+            if score is None:
+                continue
+            top.push(values[group_pos] if group_pos is not None else None, score, values[:n])
+
+    # Names are joined for the winners only
+    winners = top.result()
+    index = get_dimension_index(customer_id)
+    index.ensure(client, join.kinds)
+    joined = join.rows(client, index, [item for _, _, _, item in winners])
+
+    rows = RowSet(out_sel + ["rank", rank_by])
+    for values, (_, rank, score, _) in zip(joined, winners):
+        rows.append(values + (rank, score))
+    return rows
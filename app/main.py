@@ -2,8 +2,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from app.routers import health, ads, totals, sales
+from app.routers import health, ads, totals, sales, exports, live
 from app.core.errors import google_ads_exception_handler
+from app.core.admission import admission_middleware, size_thread_pool
+from app.helpers.exports import resume_jobs
 from google.ads.googleads.errors import GoogleAdsException
 
 load_dotenv()
@@ -14,6 +16,9 @@ app = FastAPI(
     description="API to get data from Google Ads",
     version="1.0.0",
 )
+# Admission control: per route class concurrency limits and bounded queues
+# (added before CORS so shed responses still get CORS headers)
+app.add_middleware(admission_middleware)
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -25,10 +30,17 @@ app.include_router(health.router)
 app.include_router(ads.router)
 app.include_router(totals.router)
 app.include_router(sales.router)
+app.include_router(exports.router)
+app.include_router(live.router)
 
 # Error handling
 app.add_exception_handler(GoogleAdsException, google_ads_exception_handler)
 
+# Pick up export jobs interrupted by a restart
+app.add_event_handler("startup", resume_jobs)
+# Thread pool large enough for everything admission control lets through
+app.add_event_handler("startup", size_thread_pool)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=4009, reload=True)
\ No newline at end of file
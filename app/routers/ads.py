@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from google.ads.googleads.client import GoogleAdsClient
 from app.helpers.conversions import run_gaql_stream
+from app.helpers.rows import RowSet, RowsJSONResponse, CampaignRow, ConversionActionRow
+from app.helpers.dimensions import CAMPAIGNS_QUERY, CONVERSION_ACTIONS_QUERY, get_dimension_index
 from typing import Optional
 
 from app.core.ads_client import get_google_ads_client, get_default_customer_id
@@ -14,7 +16,7 @@ router = APIRouter(prefix="", tags=["Google Ads"])
 # - customers: list of customer IDs
 # - message: instructions to pick one of the customer IDs
 @router.get("/")
-async def list_accessible_customers(client: GoogleAdsClient = Depends(get_google_ads_client)):
+def list_accessible_customers(client: GoogleAdsClient = Depends(get_google_ads_client)):
     try:
         customer_service = client.get_service("CustomerService")
         response = customer_service.list_accessible_customers()
@@ -44,26 +46,22 @@ async def list_accessible_customers(client: GoogleAdsClient = Depends(get_google
 # ---
 @router.get("/campaigns/")
 @router.get("/campaigns/{customer_id}")
-async def get_campaigns(
+def get_campaigns(
     customer_id: str | None = None,
     client: GoogleAdsClient = Depends(get_google_ads_client),
 ):
     try:
         if not customer_id:
             customer_id = get_default_customer_id()
-        ga_service = client.get_service("GoogleAdsService")
-        query = """
-            SELECT campaign.id, campaign.name
-            FROM campaign
-            ORDER BY campaign.id
-        """
-
-        stream = ga_service.search_stream(customer_id=customer_id, query=query)
-        campaigns = []
+        # Uncached: the listing replaces the campaign names in the dimension index
+        stream = run_gaql_stream(client, customer_id, CAMPAIGNS_QUERY, use_cache=False)
+        campaigns = RowSet.of(CampaignRow)
         for batch in stream:
             for row in batch.results:
-                campaigns.append({"id": row.campaign.id, "name": row.campaign.name})
-        return {"status": "success", "campaigns": campaigns}
+                campaigns.append(CampaignRow(row.campaign.id, row.campaign.name))
+        # Fresh full listing: refresh the names used by the totals joins
+        get_dimension_index(customer_id).seed("campaign", (((r[0],), r[1]) for r in campaigns))
+        return RowsJSONResponse({"status": "success", "campaigns": campaigns})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail={"status": "error", "details": str(e)})
@@ -76,7 +74,7 @@ async def get_campaigns(
 # - rows: list of traffic sources
 # - scope: traffic_source
 @router.get("/traffic-sources")
-async def traffic_sources(
+def traffic_sources(
     customer_id: Optional[str] = None,
     period: Optional[str] = Query(None, description="LAST_30_DAYS, LAST_7_DAYS, THIS_MONTH, LAST_MONTH, ALL_TIME"),
     start_date: Optional[str] = None,
@@ -114,36 +112,26 @@ async def traffic_sources(
 # - rows: list of conversion actions
 # - scope: conversion_action
 @router.get("/conversion-actions")
-async def list_conversion_actions(
+def list_conversion_actions(
     customer_id: Optional[str] = None,
 ):
     client = get_google_ads_client()
     customer_id = customer_id or get_default_customer_id()
 
-    query = """
-      SELECT
-        conversion_action.id,
-        conversion_action.name,
-        conversion_action.category,
-        conversion_action.status,
-        conversion_action.type,
-        conversion_action.primary_for_goal
-      FROM conversion_action
-      ORDER BY conversion_action.name
-    """
-
-    rows = []
+    rows = RowSet.of(ConversionActionRow)
     try:
-        for batch in run_gaql_stream(client, customer_id, query):
+        # Uncached: the listing replaces the conversion action names in the dimension index
+        for batch in run_gaql_stream(client, customer_id, CONVERSION_ACTIONS_QUERY, use_cache=False):
             for row in batch.results:
-                rows.append({
-                    "id": row.conversion_action.id,
-                    "name": row.conversion_action.name,
-                    "category": row.conversion_action.category.name,
-                    "status": row.conversion_action.status.name,
-                    "type": row.conversion_action.type.name,
-                    "primary_for_goal": row.conversion_action.primary_for_goal,
-            })
-        return {"status": "success", "rows": rows, "scope": "conversion_action"}
+                rows.append(ConversionActionRow(
+                    id=row.conversion_action.id,
+                    name=row.conversion_action.name,
+                    category=row.conversion_action.category.name,
+                    status=row.conversion_action.status.name,
+                    type=row.conversion_action.type.name,
+                    primary_for_goal=row.conversion_action.primary_for_goal,
+                ))
+        get_dimension_index(customer_id).seed("conversion_action", (((r[0],), r[1]) for r in rows))
+        return RowsJSONResponse({"status": "success", "rows": rows, "scope": "conversion_action"})
     except Exception as e:
         raise HTTPException(500, detail={"status": "error", "details": str(e)})
\ No newline at end of file
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from app.core.ads_client import get_default_customer_id
+from app.helpers.conversions import normalize_fields
+from app.helpers.exports import EXPORT_FORMATS, EXPORT_SCOPES, create_job, exports_dir, read_job, retry_job
+
+router = APIRouter(prefix="", tags=["Google Ads Exports"])
+
+
+class ExportRequest(BaseModel):
+    scope: str
+    start_date: str
+    end_date: str
+    fields: Optional[str] = None
+    customer_ids: Optional[List[str]] = None
+    format: str = "csv"
+
+
+def _job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    files = [c["file"] for c in job["chunks"][:job["chunks_done"]]]
+    return {
+        "status": "success",
+        "job_id": job["job_id"],
+        "job_status": job["status"],
+        "scope": job["scope"],
+        "format": job["format"],
+        "chunks_done": job["chunks_done"],
+        "chunks_total": len(job["chunks"]),
+        # finished chunks plus the one being written
+        "rows": job["rows"] + job.get("chunk_rows", 0),
+        "bytes": job["bytes"] + job.get("chunk_bytes", 0),
+        "error": job["error"],
+        "files": files,
+    }
+
+
+# Create export job
+# POST /exports
+# Returns:
+# - status: success
+# - job_id: id to poll GET /exports/{job_id}
+# - job_status: queued
+@router.post("/exports", status_code=202)
+async def create_export(req: ExportRequest):
+    """
+    Export a scope for one or more customers and a date range to CSV/Parquet
+    files on disk. The job runs in the background in date chunks.
+    """
+    if req.scope not in EXPORT_SCOPES:
+        raise HTTPException(400, detail={"status": "error", "details": f"scope must be one of {', '.join(EXPORT_SCOPES)}"})
+    if req.format not in EXPORT_FORMATS:
+        raise HTTPException(400, detail={"status": "error", "details": f"format must be one of {', '.join(EXPORT_FORMATS)}"})
+    fields = normalize_fields(req.fields, EXPORT_SCOPES[req.scope])
+    customer_ids = req.customer_ids or [get_default_customer_id()]
+    try:
+        job = create_job(req.scope, fields, customer_ids, req.start_date, req.end_date, req.format)
+    except ValueError as e:
+        raise HTTPException(400, detail={"status": "error", "details": str(e)})
+    return _job_status(job)
+
+
+# Export job status
+# GET /exports/{job_id}
+# Returns:
+# - status: success
+# - job_status: queued, running, done or failed
+# - rows / bytes: progress so far
+# - files: finished files, downloadable from /exports/{job_id}/files/{name}
+@router.get("/exports/{job_id}")
+async def export_status(job_id: str):
+    job = read_job(job_id)
+    if job is None:
+        raise HTTPException(404, detail={"status": "error", "details": "export job not found"})
+    return _job_status(job)
+
+
+# Retry a failed export job from its last finished chunk
+# POST /exports/{job_id}/retry
+@router.post("/exports/{job_id}/retry", status_code=202)
+async def retry_export(job_id: str):
+    job = retry_job(job_id)
+    if job is None:
+        raise HTTPException(404, detail={"status": "error", "details": "export job not found"})
+    return _job_status(job)
+
+
+# Download one finished export file
+# GET /exports/{job_id}/files/{name}
+@router.get("/exports/{job_id}/files/{name}")
+async def download_export_file(job_id: str, name: str):
+    job = read_job(job_id)
+    if job is None:
+        raise HTTPException(404, detail={"status": "error", "details": "export job not found"})
+    if name not in _job_status(job)["files"]:
+        raise HTTPException(404, detail={"status": "error", "details": "file not found or not finished yet"})
+    media_type = "text/csv" if job["format"] == "csv" else "application/octet-stream"
+    return FileResponse(exports_dir() / job_id / name, media_type=media_type, filename=name)
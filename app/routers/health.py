@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from app.core.admission import admission_stats
 
 router = APIRouter(tags=["Health"])
 
@@ -10,3 +11,13 @@ async def health_check():
         "version": "2.0.0",
         "message": "Service is running correctly",
     }
+
+# Admission control stats
+# GET /health/admission
+# Returns, per route class (ngrams, heavy, reports, light):
+# - limit / active / queued: current concurrency state
+# - admitted / shed: request counters
+# - avg_wait_ms / max_wait_ms: time spent queued
+@router.get("/health/admission")
+async def admission_health():
+    return {"status": "success", "classes": admission_stats()}
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.core.ads_client import get_google_ads_client, get_default_customer_id
+from app.helpers.live import get_feed
+from app.routers.sales import fetch_sales_per_campaign
+from app.routers.totals import fetch_traffic_sources
+
+router = APIRouter(prefix="", tags=["Google Ads Live"])
+
+# scope -> (row key, fetch(client, customer_id, max_age)); polls read through the
+# result cache, accepting results at most one poll interval old
+LIVE_SCOPES = {
+    "traffic-sources": ("source", lambda client, cid, max_age: fetch_traffic_sources(client, cid, max_age=max_age)),
+    "sales-campaigns": ("campaign_id", lambda client, cid, max_age: fetch_sales_per_campaign(client, cid, max_age=max_age)),
+}
+
+# Live dashboard feed (Server-Sent Events)
+# GET /live/traffic-sources
+# GET /live/sales-campaigns
+# Events:
+# - snapshot: all rows, on connect and after falling behind
+# - delta: changed rows (key + changed fields) and removed keys
+# - error: upstream error; polling continues
+@router.get("/live/{scope}")
+async def live_feed(scope: str, customer_id: Optional[str] = None):
+    """
+    One shared poller per (customer, scope) and app process every
+    LIVE_POLL_SECONDS; subscribers only receive what changed since the last
+    poll. With several uvicorn workers each runs its own poller, and they
+    share upstream results through the GAQL cache.
+    """
+    if scope not in LIVE_SCOPES:
+        raise HTTPException(404, detail={"status": "error", "details": f"scope must be one of {', '.join(LIVE_SCOPES)}"})
+    client = get_google_ads_client()
+    customer_id = customer_id or get_default_customer_id()
+    key_field, fetch = LIVE_SCOPES[scope]
+
+    async def events():
+        # Look up and subscribe with no await in between, so the feed cannot
+        # be torn down by its last subscriber leaving in the meantime
+        feed = get_feed(customer_id, scope, lambda max_age: fetch(client, customer_id, max_age), key_field)
+        q = feed.subscribe()
+        try:
+            while True:
+                yield await q.get()
+        finally:
+            feed.unsubscribe(q)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,26 +1,75 @@
-from fastapi import APIRouter, HTTPException    
+from fastapi import APIRouter, HTTPException
 from typing import Optional
 from app.core.ads_client import get_google_ads_client, get_default_customer_id
 from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
 from app.helpers.conversions import run_gaql_stream, micros_to_amount, safe_div
+from app.helpers.rows import RowSet, RowsJSONResponse, SalesCampaignRow
+from app.helpers.compare import COMPARE_QUERY, windows_or_400, compare_totals
 
 router = APIRouter(prefix="", tags=["Google Ads Sales"])
 
+# Enabled campaigns by conversion value, with cost and ROAS
+def fetch_sales_per_campaign(client: GoogleAdsClient, customer_id: str, limit: int = 250, max_age: Optional[float] = None) -> RowSet:
+    query = f"""
+      SELECT
+        campaign.id,
+        campaign.name,
+        metrics.conversions,
+        metrics.conversions_value,
+        metrics.cost_micros
+      FROM campaign
+      WHERE campaign.status = 'ENABLED'
+      ORDER BY metrics.conversions_value DESC
+      LIMIT {limit}
+    """
+
+    rows = RowSet.of(SalesCampaignRow)
+    for batch in run_gaql_stream(client, customer_id, query, max_age=max_age):
+        for row in batch.results:
+            cost = micros_to_amount(row.metrics.cost_micros)
+            roas = safe_div(row.metrics.conversions_value, cost) if cost > 0 else None
+            rows.append(SalesCampaignRow(
+                campaign_id=row.campaign.id,
+                campaign_name=row.campaign.name,
+                conversions=row.metrics.conversions,
+                conversion_value=row.metrics.conversions_value,
+                cost_micros=row.metrics.cost_micros,
+                cost=cost,
+                roas=roas,
+            ))
+    return rows
+
 @router.get("/sales/campaigns")
-async def sales_per_campaign(
+def sales_per_campaign(
     customer_id: Optional[str] = None,
     period: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     limit: int = 250,
+    compare: Optional[str] = COMPARE_QUERY,
 ):
     """
     Sales by campaign.
+    With compare: clicks, cost, conversions and ROAS against the previous window.
     """
     client = get_google_ads_client()
     customer_id = customer_id or get_default_customer_id()
 
+    if compare:
+        windows = windows_or_400(compare, start_date, end_date)
+        try:
+            rows = compare_totals(
+                client, customer_id, "campaign",
+                [("campaign.id", "campaign_id"), ("campaign.name", "campaign_name")],
+                windows, where="campaign.status = 'ENABLED'",
+            )
+            rows.sort("conversion_value", reverse=True)
+            rows.truncate(limit)
+            return RowsJSONResponse({"status": "success", "rows": rows, "compare": compare, "periods": windows, "scope": "sales_per_campaign"})
+        except Exception as e:
+            raise HTTPException(500, detail={"status": "error", "details": str(e)})
+
     # if period:
     #     date_clause = f" DURING {period} "
     # elif start_date and end_date:
@@ -28,34 +77,8 @@ async def sales_per_campaign(
     # else:
     #     date_clause = " DURING LAST_30_DAYS "
 
-    query = f"""
-      SELECT
-        campaign.id,
-        campaign.name,
-        metrics.conversions,
-        metrics.conversions_value,
-        metrics.cost_micros
-      FROM campaign
-      WHERE campaign.status = 'ENABLED'
-      ORDER BY metrics.conversions_value DESC
-      LIMIT {limit}
-    """
-
     try:
-        rows = []
-        for batch in run_gaql_stream(client, customer_id, query):
-            for row in batch.results:
-                cost = micros_to_amount(row.metrics.cost_micros)
-                roas = safe_div(row.metrics.conversions_value, cost) if cost > 0 else None
-                rows.append({
-                    "campaign_id": row.campaign.id,
-                    "campaign_name": row.campaign.name,
-                    "conversions": row.metrics.conversions,
-                    "conversion_value": row.metrics.conversions_value,
-                    "cost_micros": row.metrics.cost_micros,
-                    "cost": cost,
-                    "roas": roas,
-                })
-        return {"status": "success", "rows": rows, "scope": "sales_per_campaign"}
+        rows = fetch_sales_per_campaign(client, customer_id, limit)
+        return RowsJSONResponse({"status": "success", "rows": rows, "scope": "sales_per_campaign"})
     except Exception as e:
         raise HTTPException(500, detail={"status": "error", "details": str(e)})
\ No newline at end of file
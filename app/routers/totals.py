@@ -1,11 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import Dict, Optional, List, Any
-from app.helpers.conversions import normalize_fields, pick_fields, run_gaql_stream, micros_to_amount, safe_div
+from typing import Dict, Optional
+from app.helpers.conversions import normalize_fields, pick_values, run_gaql_stream, micros_to_amount, safe_div
+from app.helpers.rows import RowSet, RowsJSONResponse, TrafficSourceRow
+from app.helpers.compare import COMPARE_QUERY, windows_or_400, compare_totals
+from app.helpers.dimensions import DimensionJoin, get_dimension_index
+from app.helpers.topk import RANK_METRICS, top_k_search_terms
+from app.helpers.ngrams import aggregate_ngrams, rank_ngrams
 from app.core.ads_client import get_google_ads_client, get_default_customer_id
+from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
 
 router = APIRouter(prefix="", tags=["Google Ads Totals"])
 
+# Period-over-period rows for a totals route (compare=previous_period|previous_year)
+def _compare_response(client, customer_id, resource, key_fields, compare, start_date, end_date, scope, where=None, limit=None):
+    windows = windows_or_400(compare, start_date, end_date)
+    try:
+        rows = compare_totals(client, customer_id, resource, key_fields, windows, where=where)
+        rows.sort("clicks", reverse=True)
+        if limit is not None:
+            rows.truncate(limit)
+        return RowsJSONResponse({"status": "success", "rows": rows, "compare": compare, "periods": windows, "scope": scope})
+    except GoogleAdsException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, detail={"status": "error", "details": str(e)})
+
+
 # Customers totals
 # GET /totals/customers
 # GET /totals/customers/{customer_id}
@@ -24,7 +45,7 @@ router = APIRouter(prefix="", tags=["Google Ads Totals"])
 # - scope: customer
 # ---
 @router.get("/totals/customers")
-async def totals_customers(
+def totals_customers(
     customer_id: Optional[str] = None,
     period: Optional[str] = Query(None, description="LAST_30_DAYS, LAST_7_DAYS, THIS_MONTH, LAST_MONTH, ALL_TIME"),
     start_date: Optional[str] = None,
@@ -33,14 +54,19 @@ async def totals_customers(
         None,
         description="List of GAQL fields separated by comma. Example: metrics.clicks,metrics.conversions,metrics.cost_micros,metrics.conversions_value"
     ),
+    compare: Optional[str] = COMPARE_QUERY,
 ):
     """
     Data RAW of aggregated metrics at customer level.
     Default: clicks, impressions, conversions, conversions_value, cost_micros.
+    With compare: clicks, cost, conversions and ROAS against the previous window.
     """
     client = get_google_ads_client()
     customer_id = customer_id or get_default_customer_id()
 
+    if compare:
+        return _compare_response(client, customer_id, "customer", [], compare, start_date, end_date, "customer")
+
     sel = normalize_fields(
         fields,
         [
@@ -56,12 +82,12 @@ async def totals_customers(
     query = f"SELECT {', '.join(sel)} FROM customer"
 
     try:
-        items: List[Dict[str, Any]] = []
+        items = RowSet(sel)
         for batch in run_gaql_stream(client, customer_id, query):
             for row in batch.results:
-                items.append(pick_fields(row, sel))
+                items.append(pick_values(row, sel))
         # customer-level usually returns 1 row (aggregated); we return list for consistency
-        return {"status": "success", "rows": items, "selected_fields": sel, "scope": "customer"}
+        return RowsJSONResponse({"status": "success", "rows": items, "selected_fields": sel, "scope": "customer"})
     except GoogleAdsException:
         raise
     except Exception as e:
@@ -86,7 +112,7 @@ async def totals_customers(
 # - scope: campaign
 # ---
 @router.get("/totals/campaigns")
-async def totals_campaigns(
+def totals_campaigns(
     customer_id: Optional[str] = None,
     period: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -97,15 +123,25 @@ async def totals_campaigns(
     ),
     where: Optional[str] = Query(None, description="Fragment WHERE additional. Example: campaign.status = 'ENABLED'"),
     order_by: Optional[str] = Query(None, description="Example: metrics.clicks DESC"),
-    limit: int = 250
+    limit: int = 250,
+    compare: Optional[str] = COMPARE_QUERY,
 ):
     """
     Data RAW of aggregated metrics at campaign level.
     Default: clicks, impressions, conversions, conversions_value, cost_micros.
+    With compare: clicks, cost, conversions and ROAS against the previous window,
+    sorted by current clicks (fields and order_by are ignored).
     """
     client = get_google_ads_client()
     customer_id = customer_id or get_default_customer_id()
 
+    if compare:
+        return _compare_response(
+            client, customer_id, "campaign",
+            [("campaign.id", "campaign.id"), ("campaign.name", "campaign.name")],
+            compare, start_date, end_date, "campaign", where=where, limit=limit,
+        )
+
     sel = normalize_fields(
         fields,
         [
@@ -130,8 +166,10 @@ async def totals_campaigns(
     order_clause = f" ORDER BY {order_by} " if order_by else ""
     limit_clause = f" LIMIT {int(limit)} "
 
+    # Names are joined locally from the dimension index; upstream returns ids and metrics
+    join = DimensionJoin(sel, keep=order_by)
     query = f"""
-      SELECT {', '.join(sel)}
+      SELECT {', '.join(join.upstream)}
       FROM campaign
       {where_clause}
       {order_clause}
@@ -139,11 +177,14 @@ async def totals_campaigns(
     """
 
     try:
-        rows: List[Dict[str, Any]] = []
+        index = get_dimension_index(customer_id)
+        index.ensure(client, join.kinds)
+        raw = []
         for batch in run_gaql_stream(client, customer_id, query):
             for row in batch.results:
-                rows.append(pick_fields(row, sel))
-        return {"status": "success", "rows": rows, "selected_fields": sel, "scope": "campaign"}
+                raw.append(pick_values(row, join.upstream))
+        rows = join.rows(client, index, raw)
+        return RowsJSONResponse({"status": "success", "rows": rows, "selected_fields": sel, "scope": "campaign"})
     except GoogleAdsException:
         raise
     except Exception as e:
@@ -166,7 +207,7 @@ async def totals_campaigns(
 # - selected_fields: list of selected fields
 # - scope: keyword_view
 @router.get("/totals/keywords")
-async def totals_keywords(
+def totals_keywords(
     customer_id: Optional[str] = None,
     period: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -177,15 +218,30 @@ async def totals_keywords(
     ),
     where: Optional[str] = Query(None, description="Example: ad_group_criterion.status = 'ENABLED'"),
     order_by: Optional[str] = Query(None, description="Example: metrics.clicks DESC"),
-    limit: int = 500
+    limit: int = 500,
+    compare: Optional[str] = COMPARE_QUERY,
 ):
     """
     Data RAW of aggregated metrics at keyword level.
     Default: clicks, impressions, conversions, conversions_value, cost_micros.
+    With compare: clicks, cost, conversions and ROAS against the previous window,
+    sorted by current clicks (fields and order_by are ignored).
     """
     client = get_google_ads_client()
     customer_id = customer_id or get_default_customer_id()
 
+    if compare:
+        return _compare_response(
+            client, customer_id, "keyword_view",
+            [
+                ("ad_group.id", "ad_group.id"),
+                ("ad_group.name", "ad_group.name"),
+                ("ad_group_criterion.criterion_id", "ad_group_criterion.criterion_id"),
+                ("ad_group_criterion.keyword.text", "ad_group_criterion.keyword.text"),
+            ],
+            compare, start_date, end_date, "keyword_view", where=where, limit=limit,
+        )
+
     sel = normalize_fields(
         fields,
         [
@@ -210,8 +266,10 @@ async def totals_keywords(
     order_clause = f" ORDER BY {order_by} " if order_by else ""
     limit_clause = f" LIMIT {int(limit)} "
 
+    # Names are joined locally from the dimension index; upstream returns ids and metrics
+    join = DimensionJoin(sel, keep=order_by)
     query = f"""
-      SELECT {', '.join(sel)}
+      SELECT {', '.join(join.upstream)}
       FROM keyword_view
       {where_clause}
       {order_clause}
@@ -219,11 +277,14 @@ async def totals_keywords(
     """
 
     try:
-        rows: List[Dict[str, Any]] = []
+        index = get_dimension_index(customer_id)
+        index.ensure(client, join.kinds)
+        raw = []
         for batch in run_gaql_stream(client, customer_id, query):
             for row in batch.results:
-                rows.append(pick_fields(row, sel))
-        return {"status": "success", "rows": rows, "selected_fields": sel, "scope": "keyword_view"}
+                raw.append(pick_values(row, join.upstream))
+        rows = join.rows(client, index, raw)
+        return RowsJSONResponse({"status": "success", "rows": rows, "selected_fields": sel, "scope": "keyword_view"})
     except GoogleAdsException:
         raise
     except Exception as e:
@@ -246,7 +307,7 @@ async def totals_keywords(
 # - selected_fields: list of selected fields
 # - scope: search_term_view
 @router.get("/totals/search-terms")
-async def totals_search_terms(
+def totals_search_terms(
     customer_id: Optional[str] = None,
     period: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -257,15 +318,30 @@ async def totals_search_terms(
     ),
     where: Optional[str] = None,
     order_by: Optional[str] = "metrics.clicks DESC",
-    limit: int = 500
+    limit: int = 500,
+    top_k: Optional[int] = Query(None, ge=1, le=10000, description="Top K per group over the full stream (order_by/limit are ignored)"),
+    rank_by: str = Query("clicks", pattern=f"^({'|'.join(RANK_METRICS)})$", description="Metric or derived metric for top_k: " + ", ".join(RANK_METRICS)),
+    group_by: Optional[str] = Query(None, pattern="^(campaign|ad_group)$", description="Top K per campaign or per ad_group"),
+    ascending: bool = Query(False, description="Lowest first, e.g. cheapest cac"),
+    compare: Optional[str] = COMPARE_QUERY,
 ):
     """
     Data RAW of aggregated metrics at search term level.
     Default: clicks, impressions, conversions, conversions_value, cost_micros.
+    With top_k: the K best rows per group by rank_by, adding rank and the rank_by value.
+    With compare: per search term (summed over ad groups) against the previous
+    window, sorted by current clicks.
     """
     client = get_google_ads_client()
     customer_id = customer_id or get_default_customer_id()
 
+    if compare:
+        return _compare_response(
+            client, customer_id, "search_term_view",
+            [("search_term_view.search_term", "search_term_view.search_term")],
+            compare, start_date, end_date, "search_term_view", where=where, limit=limit,
+        )
+
     sel = normalize_fields(
         fields,
         [
@@ -286,27 +362,136 @@ async def totals_search_terms(
     if where:
         where_clause += (" AND " if where_clause else " WHERE ") + where
 
+    if top_k:
+        try:
+            rows = top_k_search_terms(client, customer_id, sel, where_clause, top_k, rank_by, group_by, ascending)
+            return RowsJSONResponse({
+                "status": "success", "rows": rows, "selected_fields": list(rows.keys), "scope": "search_term_view",
+                "top_k": top_k, "rank_by": rank_by, "group_by": group_by,
+            })
+        except GoogleAdsException:
+            raise
+        except Exception as e:
+            raise HTTPException(500, detail={"status": "error", "details": str(e)})
+
     order_clause = f" ORDER BY {order_by} " if order_by else ""
     limit_clause = f" LIMIT {int(limit)} "
 
+    # Names are joined locally from the dimension index; upstream returns ids and metrics
+    join = DimensionJoin(sel, keep=order_by)
     query = f"""
-      SELECT {', '.join(sel)}
+      SELECT {', '.join(join.upstream)}
       FROM search_term_view
       {order_clause}
       {limit_clause}
     """
 
     try:
-        rows: List[Dict[str, Any]] = []
+        index = get_dimension_index(customer_id)
+        index.ensure(client, join.kinds)
+        raw = []
         for batch in run_gaql_stream(client, customer_id, query):
             for row in batch.results:
-                rows.append(pick_fields(row, sel))
-        return {"status": "success", "rows": rows, "selected_fields": sel, "scope": "search_term_view"}
+                raw.append(pick_values(row, join.upstream))
+        rows = join.rows(client, index, raw)
+        return RowsJSONResponse({"status": "success", "rows": rows, "selected_fields": sel, "scope": "search_term_view"})
     except GoogleAdsException:
         raise
     except Exception as e:
         raise HTTPException(500, detail={"status": "error", "details": str(e)})
 
+# Search terms n-grams
+# GET /totals/search-terms/ngrams
+# Returns:
+# - status: success
+# - rows: top n-grams per n with their metrics
+# - n: n-gram sizes
+# - rank_by: metric used for ranking
+# - scope: search_term_ngram
+@router.get("/totals/search-terms/ngrams")
+def totals_search_term_ngrams(
+    customer_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    where: Optional[str] = Query(None, description="Example: campaign.id = 123"),
+    n: str = Query("1,2,3", pattern="^[123](,[123])*$", description="N-gram sizes, e.g. 1,2"),
+    rank_by: str = Query("cost", pattern=f"^({'|'.join(RANK_METRICS)})$", description="Metric or derived metric: " + ", ".join(RANK_METRICS)),
+    ascending: bool = False,
+    min_clicks: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=10000, description="N-grams returned per size"),
+    workers: int = Query(0, ge=0, le=16, description="Pool workers used for large accounts (capped by NGRAM_POOL_WORKERS); 0 runs in-process"),
+):
+    """
+    Clicks, cost and conversions per 1-, 2- and 3-gram of the search terms,
+    aggregated server-side while search_term_view streams in.
+    Each search term counts once per n-gram it contains.
+    """
+    client = get_google_ads_client()
+    customer_id = customer_id or get_default_customer_id()
+
+    where_clause = ""
+    if start_date and end_date:
+        where_clause = f" WHERE segments.date BETWEEN '{start_date}' AND '{end_date}' "
+    if where:
+        where_clause += (" AND " if where_clause else " WHERE ") + where
+    sizes = sorted({int(x) for x in n.split(",")})
+
+    try:
+        table = aggregate_ngrams(client, customer_id, where_clause, sizes, workers=workers)
+        rows = rank_ngrams(table, rank_by, limit, ascending=ascending, min_clicks=min_clicks)
+        return RowsJSONResponse({"status": "success", "rows": rows, "n": sizes, "rank_by": rank_by, "scope": "search_term_ngram"})
+    except GoogleAdsException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, detail={"status": "error", "details": str(e)})
+
+# Sum metrics by ad_network_type, most clicks first
+def fetch_traffic_sources(client: GoogleAdsClient, customer_id: str, max_age: Optional[float] = None) -> RowSet:
+    query = f"""
+      SELECT
+        segments.ad_network_type,
+        metrics.clicks,
+        metrics.impressions,
+        metrics.conversions,
+        metrics.conversions_value,
+        metrics.cost_micros
+      FROM customer
+    """
+
+    # Sum by ad_network_type
+    agg: Dict[str, Dict[str, float]] = {}
+    for batch in run_gaql_stream(client, customer_id, query, max_age=max_age):
+        for r in batch.results:
+            k = r.segments.ad_network_type.name  # enum -> string
+            if k not in agg:
+                agg[k] = {"clicks": 0, "conversions": 0.0, "value": 0.0, "cost_micros": 0}
+            agg[k]["clicks"] += r.metrics.clicks or 0
+            agg[k]["conversions"] += r.metrics.conversions or 0.0
+            agg[k]["value"] += r.metrics.conversions_value or 0.0
+            agg[k]["cost_micros"] += r.metrics.cost_micros or 0
+
+    items = RowSet.of(TrafficSourceRow)
+    for k, v in agg.items():
+        cost = micros_to_amount(v["cost_micros"])
+        conv_rate = safe_div(v["conversions"], v["clicks"]) * 100
+        cac = safe_div(cost, v["conversions"]) if v["conversions"] else 0.0
+        roas = safe_div(v["value"], cost)
+        items.append(TrafficSourceRow(
+            source=k,  # Google Search, Search Partners, Display, YouTube, etc.
+            clicks=int(v["clicks"]),
+            leads=v["conversions"],
+            sales=None,
+            conv_rate_pct=round(conv_rate, 2),
+            cac=round(cac, 2),
+            spend=cost,
+            revenue=v["value"],
+            roas=roas,
+        ))
+    # Sort by clicks descending
+    items.sort("clicks", reverse=True)
+    return items
+
+
 # Traffic sources totals
 # GET /totals/traffic-sources
 # GET /totals/traffic-sources/{customer_id}
@@ -322,18 +507,27 @@ async def totals_search_terms(
 # - items: list of traffic sources
 # - message: instructions to pick one of the traffic sources
 @router.get("/totals/traffic-sources")
-async def traffic_sources(
+def traffic_sources(
     customer_id: Optional[str] = None,
     period: Optional[str] = None,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    compare: Optional[str] = COMPARE_QUERY,
 ):
     """
     Data RAW of aggregated metrics at traffic source level.
     Default: clicks, impressions, conversions, conversions_value, cost_micros.
+    With compare: clicks, cost, conversions and ROAS per source against the previous window.
     """
     client = get_google_ads_client()
     customer_id = customer_id or get_default_customer_id()
+
+    if compare:
+        return _compare_response(
+            client, customer_id, "customer",
+            [("segments.ad_network_type", "source")],
+            compare, start_date, end_date, "traffic_source",
+        )
     # date_clause = build_date_where(period, start_date, end_date)
 
     # TODO: add date clause
@@ -341,50 +535,9 @@ async def traffic_sources(
     # if start_date and end_date:
     #     where_clause = f" WHERE segments.date BETWEEN '{start_date}' AND '{end_date}' "
     
-    query = f"""
-      SELECT
-        segments.ad_network_type,
-        metrics.clicks,
-        metrics.impressions,
-        metrics.conversions,
-        metrics.conversions_value,
-        metrics.cost_micros
-      FROM customer
-    """
-
-    # Sum by ad_network_type
-    agg: Dict[str, Dict[str, float]] = {}
     try:
-        for batch in run_gaql_stream(client, customer_id, query):
-            for r in batch.results:
-                k = r.segments.ad_network_type.name  # enum -> string
-                if k not in agg:
-                    agg[k] = {"clicks": 0, "conversions": 0.0, "value": 0.0, "cost_micros": 0}
-                agg[k]["clicks"] += r.metrics.clicks or 0
-                agg[k]["conversions"] += r.metrics.conversions or 0.0
-                agg[k]["value"] += r.metrics.conversions_value or 0.0
-                agg[k]["cost_micros"] += r.metrics.cost_micros or 0
-
-        items = []
-        for k, v in agg.items():
-            cost = micros_to_amount(v["cost_micros"])
-            conv_rate = safe_div(v["conversions"], v["clicks"]) * 100
-            cac = safe_div(cost, v["conversions"]) if v["conversions"] else 0.0
-            roas = safe_div(v["value"], cost)
-            items.append({
-                "source": k,  # Google Search, Search Partners, Display, YouTube, etc.
-                "clicks": int(v["clicks"]),
-                "leads": v["conversions"],
-                "sales": None,
-                "conv_rate_pct": round(conv_rate, 2),
-                "cac": round(cac, 2),
-                "spend": cost,
-                "revenue": v["value"],
-                "roas": roas
-            })
-        # Sort by clicks descending
-        items.sort(key=lambda x: x["clicks"], reverse=True)
-        return {"status": "success", "rows": items, "scope": "traffic_source", "selected_fields": ["segments.ad_network_type", "metrics.clicks", "metrics.conversions", "metrics.conversions_value", "metrics.cost_micros"]}
+        items = fetch_traffic_sources(client, customer_id)
+        return RowsJSONResponse({"status": "success", "rows": items, "scope": "traffic_source", "selected_fields": ["segments.ad_network_type", "metrics.clicks", "metrics.conversions", "metrics.conversions_value", "metrics.cost_micros"]})
     except GoogleAdsException:
         raise
     except Exception as e:
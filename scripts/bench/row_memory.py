@@ -0,0 +1,60 @@
+# python -m scripts.bench.row_memory
+# Bytes per row held by a report: dict-per-row vs RowSet of tuples.
+import json
+import tracemalloc
+from fastapi.encoders import jsonable_encoder
+from app.helpers.rows import RowSet, SalesCampaignRow, encode_payload
+
+N = 100_000
+TOTALS_FIELDS = [
+    "campaign.id",
+    "campaign.name",
+    "metrics.clicks",
+    "metrics.impressions",
+    "metrics.conversions",
+    "metrics.conversions_value",
+    "metrics.cost_micros",
+]
+
+def _sales_values(i: int) -> tuple:
+    cost_micros = 1_000_000 + i
+    return (10_000_000 + i, f"Campaign {i}", i * 0.5, i * 12.5, cost_micros, round(cost_micros / 1e6, 2), 1.25)
+
+def _totals_values(i: int) -> tuple:
+    return (10_000_000 + i, f"Campaign {i}", i, i * 10, i * 0.5, i * 12.5, 1_000_000 + i)
+
+def _measure(build) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (after - before) / N
+
+def _as_dicts(keys, values_fn):
+    return [dict(zip(keys, values_fn(i))) for i in range(N)]
+
+def _as_rowset(rs: RowSet, values_fn):
+    for i in range(N):
+        rs.append(values_fn(i))
+    return rs
+
+def run():
+    cases = [
+        ("sales_per_campaign", SalesCampaignRow._fields, _sales_values),
+        ("totals_campaigns", TOTALS_FIELDS, _totals_values),
+    ]
+    print(f"rows: {N}")
+    for name, keys, values_fn in cases:
+        d = _measure(lambda: _as_dicts(keys, values_fn))
+        t = _measure(lambda: _as_rowset(RowSet(keys), values_fn))
+        print(f"{name:<20} dict: {d:7.1f} B/row   RowSet: {t:7.1f} B/row   ({(1 - t / d) * 100:.0f}% less)")
+
+    # Same JSON as the dict-based response
+    rs = _as_rowset(RowSet(TOTALS_FIELDS), _totals_values)
+    plain = json.dumps(jsonable_encoder({"rows": list(rs.dicts())}), ensure_ascii=False, separators=(",", ":"))
+    assert encode_payload({"rows": rs}) == plain
+
+if __name__ == "__main__":
+    run()